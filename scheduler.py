@@ -2,80 +2,131 @@
 from __future__ import annotations
 
 import argparse
-import json
+import atexit
+import itertools
 import os
 import sys
+import threading
 import traceback
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import ijson                                        # optional: streaming parse for --limit
+except ImportError:
+    ijson = None
+
+# ValueError covers json/orjson decode errors and bad UTF-8; ijson has its own base class
+_QUEUE_LOAD_ERRORS = (OSError, ValueError) + ((ijson.JSONError,) if ijson is not None else ())
 
 # --- Project paths ---
 QUEUE_PATH = "post_queue.json"
 LOG_PATH   = "silhouette_log.txt"
 
+# --- Tunables ---
+CONCURRENCY = int(os.getenv("SILHOUETTE_CONCURRENCY", "4"))   # max jobs in flight
+LOG_TO_STDOUT = os.getenv("SILHOUETTE_LOG_STDOUT", "1") == "1"  # echo log lines to stdout
+
 # --- Utilities (your modules) ---
 from utils.media_handler import prepare_media           # (media_path: str) -> Any | None
 from utils.poster import post_content                   # (text: str, media: Any) -> dict
+from utils.jsonio import loads as json_loads
 from utils.metrics import (
-    load_metrics, save_metrics, observe_attempt, Stopwatch
+    Metrics, load_metrics, save_metrics, observe_attempt, Stopwatch, utc_now_iso
 )
 
 # ---------------------------
 # Logging helpers
 # ---------------------------
-def _utc_now_iso() -> str:
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+# Log file is opened once and reused; flushed/closed at interpreter exit
+_LOG_FH = None
+_LOG_LOCK = threading.Lock()
+
+def _log_fh():
+    global _LOG_FH
+    if _LOG_FH is None:
+        _LOG_FH = open(LOG_PATH, "a", encoding="utf-8", buffering=1 << 16)
+        atexit.register(_LOG_FH.close)
+    return _LOG_FH
+
+def log_many(lines: List[str]) -> None:
+    """Log several messages with one file write (and one stdout write if LOG_TO_STDOUT)."""
+    ts = utc_now_iso()
+    text = "\n".join(f"[{ts}] {msg}" for msg in lines) + "\n"
+    with _LOG_LOCK:
+        if LOG_TO_STDOUT:
+            sys.stdout.write(text)
+        try:
+            _log_fh().write(text)
+        except OSError:
+            # If logging to file fails, don’t crash the job
+            pass
 
 def log_action(msg: str) -> None:
-    line = f"[{_utc_now_iso()}] {msg}"
-    print(line)
-    try:
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        # If logging to file fails, don’t crash the job
-        pass
+    log_many([msg])
 
 # ---------------------------
 # Queue helpers
 # ---------------------------
-def load_queue() -> List[Dict[str, Any]]:
-    """Load posts list from JSON file. Return [] on any error."""
+def load_queue(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Load posts list from JSON file. Return [] (and log) if the file is missing,
+    unreadable or not valid JSON, and [] if the top level is not a list.
+    A positive `limit` keeps only the first `limit` posts; with ijson installed
+    the file is stream-parsed and parsing stops once the limit is reached, so
+    damage after the first `limit` posts goes undetected.
+    """
     if not os.path.exists(QUEUE_PATH):
         log_action(f"WARN: queue file not found at {QUEUE_PATH}; starting empty.")
         return []
 
+    if limit is not None and limit <= 0:
+        limit = None
+
     try:
-        with open(QUEUE_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, list) else []
-    except Exception as e:
+        with open(QUEUE_PATH, "rb") as f:
+            if limit and ijson is not None:
+                # Same top-level-list rule as below ("item" would also match a key named item)
+                events = ijson.parse(f, use_float=True)
+                first = next(events, None)
+                if first is None or first[1] != "start_array":
+                    return []
+                items = ijson.items(itertools.chain([first], events), "item")
+                return list(itertools.islice(items, limit))
+            data = json_loads(f.read())
+        if not isinstance(data, list):
+            return []
+        return data[:limit] if limit else data
+    except _QUEUE_LOAD_ERRORS as e:
         log_action(f"ERROR loading queue: {e}")
         return []
 
-def maybe_limit(queue: List[Dict[str, Any]], limit: Optional[int]) -> List[Dict[str, Any]]:
-    if limit is None or limit <= 0:
-        return queue
-    return queue[:limit]
-
 # ---------------------------
 # Core per-job wrapper (metrics)
 # ---------------------------
+# Jobs run on worker threads; metrics are shared, so updates + saves are serialized
+_METRICS_LOCK = threading.Lock()
+
 def process_job_with_metrics(
     job: Dict[str, Any],
     i: int,
-    queue_len_after_exec: int,
+    queue_len: int,
     *,
     args: argparse.Namespace,
-    metrics: Dict[str, Any],
+    metrics: Metrics,
+    completed: Iterator[int],
+    flush_every: int = 16,
+    flush_interval_s: float = 2.0,
 ) -> None:
     """
     Wrap one job execution:
       - prepare media
       - post (or dry-run)
       - measure time
-      - record success/failure + latency
-      - persist metrics atomically
+      - record success/failure + latency; queue depth is `queue_len` minus the
+        run's finished jobs, counted by `completed` (itertools.count(1) per run)
+      - persist metrics atomically every `flush_every` jobs or
+        `flush_interval_s` seconds (main() flushes once more at the end)
     """
     post_id = str(job.get("id") or job.get("post_id") or f"idx_{i}")
 
@@ -99,21 +150,26 @@ def process_job_with_metrics(
             ok = True
 
         except Exception as e:
-            log_action(f"ERROR posting {post_id}: {e}")
             # Optional: dump stack to the log for debugging
-            tb = "".join(traceback.format_exception(*sys.exc_info()))
-            log_action(f"TRACE:\n{tb}")
+            tb = traceback.format_exc()
+            log_many([f"ERROR posting {post_id}: {e}", "TRACE:", tb])
             ok = False
 
         finally:
-            observe_attempt(
-                metrics,
-                post_id=post_id,
-                ok=ok,
-                latency_ms=sw.elapsed_ms,
-                queue_depth_after=queue_len_after_exec,
-            )
-            save_metrics(metrics)
+            # Read before taking the lock so waiting on other jobs' saves isn't counted
+            latency_ms = sw.elapsed_ms
+            with _METRICS_LOCK:
+                # Jobs finish out of order on the pool, so count completions here
+                observe_attempt(
+                    metrics,
+                    post_id=post_id,
+                    ok=ok,
+                    latency_ms=latency_ms,
+                    queue_depth_after=queue_len - next(completed),
+                )
+                # Batch writes: save_metrics() rewrites the whole file each call
+                if metrics.mark_dirty(flush_every, flush_interval_s):
+                    save_metrics(metrics)
 
 # ---------------------------
 # CLI / Main
@@ -128,8 +184,7 @@ def main() -> int:
     args = parse_args()
 
     # Load queue
-    queue = load_queue()
-    queue = maybe_limit(queue, args.limit)
+    queue = load_queue(args.limit)
     if not queue:
         log_action("Queue empty. Nothing to do.")
         # Still stamp metrics so last_run_at updates
@@ -139,16 +194,31 @@ def main() -> int:
 
     # Init & stamp metrics
     metrics = load_metrics()
-    log_action(f"Starting run: items={len(queue)} dry_run={args.dry_run}")
-
-    # Loop variant: enumerate (preserves list)
-    for i, job in enumerate(queue):
-        # How many items remain AFTER this attempt:
-        queue_len_after = max(0, len(queue) - (i + 1))
-        process_job_with_metrics(job, i, queue_len_after, args=args, metrics=metrics)
+    workers = max(1, CONCURRENCY)
+    log_action(f"Starting run: items={len(queue)} dry_run={args.dry_run} workers={workers}")
 
-    # Optional final heartbeat
-    save_metrics(metrics)
+    # Jobs are I/O-bound (media prep + network post), so run them on a bounded pool
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            n = len(queue)
+            completed = itertools.count(1)
+            futs = [
+                ex.submit(
+                    process_job_with_metrics, job, i, n,
+                    args=args, metrics=metrics, completed=completed,
+                )
+                for i, job in enumerate(queue)
+            ]
+            try:
+                for fut in as_completed(futs):
+                    fut.result()
+            except BaseException:
+                # Ctrl-C or a failed job: drop everything not yet started so no more posts go out
+                ex.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        # Final flush (also runs if the loop dies mid-way)
+        save_metrics(metrics)
     log_action("Run complete.")
     return 0
 
@@ -0,0 +1,24 @@
+# utils/jsonio.py
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson                                       # optional: C parser/serializer
+except ImportError:
+    orjson = None
+
+def loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any, *, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes (compact, or 2-space indented), using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
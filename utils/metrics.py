@@ -1,81 +1,126 @@
 # utils/metrics.py
 from __future__ import annotations
 
-import json, os, time, tempfile
-from datetime import datetime
-from typing import Dict, Any
+import os, time, tempfile
+from contextlib import suppress
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from utils.jsonio import loads as json_loads, dumps as json_dumps
 
 METRICS_PATH = "metrics.json"
+PRETTY = os.environ.get("SILHOUETTE_PRETTY") == "1"    # indent metrics.json for humans
+
+@dataclass(slots=True)
+class Metrics:
+    """Run counters persisted to METRICS_PATH. Fields starting with "_" stay in memory."""
+    first_run_at:    Optional[str] = None   # ISO timestamp (UTC)
+    last_run_at:     Optional[str] = None   # ISO timestamp (UTC)
+    total_processed: int = 0                # all attempts (success + error)
+    success_count:   int = 0                # ok == True
+    error_count:     int = 0                # ok == False
+    avg_latency_ms:  float = 0.0            # online moving average
+    last_post_id:    Optional[str] = None   # last processed job id
+    queue_depth:     int = 0                # # of not-yet-posted items after last run
+
+    # Flush bookkeeping for batched saves (not persisted)
+    _dirty_count:    int = field(default=0, repr=False, compare=False)
+    _last_flush_ts:  float = field(default_factory=time.monotonic, repr=False, compare=False)
+
+    def mark_dirty(self, flush_every: int, flush_interval_s: float) -> bool:
+        """Count one unsaved update; True once `flush_every` or `flush_interval_s` is reached."""
+        self._dirty_count += 1
+        return (
+            self._dirty_count >= flush_every
+            or time.monotonic() - self._last_flush_ts >= flush_interval_s
+        )
+
+_PERSISTED_FIELDS = tuple(k for k in Metrics.__dataclass_fields__ if not k.startswith("_"))
 
-DEFAULTS: Dict[str, Any] = {
-    "first_run_at": None,     # ISO timestamp (UTC)
-    "last_run_at":  None,     # ISO timestamp (UTC)
-    "total_processed": 0,     # all attempts (success + error)
-    "success_count":  0,      # ok == True
-    "error_count":    0,      # ok == False
-    "avg_latency_ms": 0.0,    # online moving average
-    "last_post_id":   None,   # last processed job id
-    "queue_depth":    0,      # # of not-yet-posted items after last run
+# Type each persisted field is cast to on load (None-default fields are strings)
+_FIELD_CASTS = {
+    k: (str if f.default is None else type(f.default))
+    for k, f in Metrics.__dataclass_fields__.items() if k in _PERSISTED_FIELDS
 }
 
-def _utc_now_iso() -> str:
-    # Trim microseconds and append Z to be explicit UTC
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+# (epoch second, ISO string): timestamps have 1s resolution, so format once per second
+_NOW_CACHE = (0, "")
 
-def load_metrics() -> Dict[str, Any]:
-    """Load metrics from disk, merging with DEFAULTS to keep forward compatibility."""
+def utc_now_iso() -> str:
+    # Whole seconds with a trailing Z to be explicit UTC
+    global _NOW_CACHE
+    sec = int(time.time())
+    if _NOW_CACHE[0] != sec:
+        _NOW_CACHE = (sec, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(sec)))
+    return _NOW_CACHE[1]
+
+def load_metrics() -> Metrics:
+    """Load metrics from disk; unknown keys are dropped, missing or malformed ones take defaults."""
+    loaded = {}
     if os.path.exists(METRICS_PATH):
         try:
-            with open(METRICS_PATH, "r", encoding="utf-8") as f:
-                m = json.load(f)
-        except Exception:
-            m = DEFAULTS.copy()
-    else:
-        m = DEFAULTS.copy()
+            with open(METRICS_PATH, "rb") as f:
+                loaded = json_loads(f.read())
+        except (OSError, ValueError):
+            loaded = {}
+    if not isinstance(loaded, dict):
+        loaded = {}
 
-    # Ensure all keys exist even if the file is from an older version
-    merged = {**DEFAULTS, **m}
-    if merged["first_run_at"] is None:
-        merged["first_run_at"] = _utc_now_iso()
-    return merged
+    # Cast once here so observe_attempt can do plain arithmetic; bad values take the default
+    fields = {}
+    for k, cast in _FIELD_CASTS.items():
+        v = loaded.get(k)
+        if v is None:
+            continue
+        try:
+            fields[k] = cast(v)
+        except (TypeError, ValueError):
+            pass
 
-def save_metrics(m: Dict[str, Any]) -> None:
-    """Persist metrics to disk atomically to avoid partial writes."""
-    m["last_run_at"] = _utc_now_iso()
+    m = Metrics(**fields)
+    if m.first_run_at is None:
+        m.first_run_at = utc_now_iso()
+    return m
+
+def save_metrics(m: Metrics) -> None:
+    """Persist metrics to disk atomically to avoid partial writes; resets the flush counters."""
+    m.last_run_at = utc_now_iso()
+    m._dirty_count = 0
+    m._last_flush_ts = time.monotonic()
+    data = {k: v for k, v in asdict(m).items() if k in _PERSISTED_FIELDS}
+    data["avg_latency_ms"] = round(data["avg_latency_ms"], 4)
     # Write to a temp file and then replace
     dirpath = os.path.dirname(os.path.abspath(METRICS_PATH)) or "."
     fd, tmp = tempfile.mkstemp(prefix="metrics_", suffix=".json", dir=dirpath)
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(m, f, indent=2)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_dumps(data, indent=PRETTY))
         os.replace(tmp, METRICS_PATH)
-    finally:
-        try:
-            if os.path.exists(tmp):
-                os.remove(tmp)
-        except Exception:
-            pass
+    except BaseException:
+        # Only a failed write leaves the temp file behind
+        with suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
 
 def observe_attempt(
-    metrics: Dict[str, Any], *,
+    metrics: Metrics, *,
     post_id: str,
     ok: bool,
     latency_ms: float,
     queue_depth_after: int
-) -> Dict[str, Any]:
+) -> Metrics:
     """
     Update counters after a job attempt using an online mean for latency.
     """
-    tp = int(metrics.get("total_processed", 0)) + 1
-    prev_avg = float(metrics.get("avg_latency_ms", 0.0))
-    new_avg = prev_avg + (latency_ms - prev_avg) / tp
-
-    metrics["total_processed"] = tp
-    metrics["avg_latency_ms"] = round(new_avg, 4)
-    metrics["success_count"] = int(metrics.get("success_count", 0)) + (1 if ok else 0)
-    metrics["error_count"]   = int(metrics.get("error_count", 0)) + (0 if ok else 1)
-    metrics["last_post_id"]  = post_id
-    metrics["queue_depth"]   = int(queue_depth_after)
+    tp = metrics.total_processed + 1
+    metrics.total_processed = tp
+    metrics.avg_latency_ms += (latency_ms - metrics.avg_latency_ms) / tp
+    if ok:
+        metrics.success_count += 1
+    else:
+        metrics.error_count += 1
+    metrics.last_post_id = post_id
+    metrics.queue_depth  = queue_depth_after
     return metrics
 
 class Stopwatch:
@@ -85,18 +130,30 @@ class Stopwatch:
             ... do work ...
         print(sw.ms)       # milliseconds
         print(sw.seconds)  # seconds
+        print(sw.ns)       # integer nanoseconds
+    Read inside the block, the properties give the time elapsed so far.
     """
     def __enter__(self):
-        self._t0 = time.perf_counter()
-        self.ms = 0.0
+        self._t0_ns = time.monotonic_ns()
+        self._ns = None
         return self
 
     def __exit__(self, *exc):
-        self.ms = (time.perf_counter() - self._t0) * 1000.0
+        self._ns = time.monotonic_ns() - self._t0_ns
+
+    @property
+    def ns(self) -> int:
+        if self._ns is None:
+            return time.monotonic_ns() - self._t0_ns
+        return self._ns
+
+    @property
+    def ms(self) -> float:
+        return self.ns / 1_000_000
 
     @property
     def seconds(self) -> float:
-        return self.ms / 1000.0
+        return self.ns / 1_000_000_000
 
     # Nice alias if your scheduler is using 'elapsed_ms'
     @property